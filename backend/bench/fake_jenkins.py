@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""Stand-in Jenkins for benchmarking the backend without a real controller.
+
+Serves the part of the Jenkins JSON API the backend uses (root and computer tree=
+queries, job/folder/build api/json, progressive console text, stop, whoami) for a
+generated topology, with optional per-request latency and error injection. Counters
+of the requests served are exposed on /_fake/stats; POST /_fake/reset clears them
+and restarts every stopped build.
+
+    python fake_jenkins.py --jobs 2000 --running 100 --folder-depth 2 --latency 20
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlparse
+
+IDLE_COLORS = ['blue', 'red', 'yellow', 'aborted', 'notbuilt']
+# Console logs are generated on demand: fixed-width lines, written at a steady rate. Every
+# fourth line starts with a console note, which progressiveText strips like Jenkins does
+LOG_LINE_BYTES = 64
+LOG_LINES_PER_SECOND = 20
+CONSOLE_NOTE = b'\x1b[8mha:AAAAWB+LCAA\x1b[0m'
+CONSOLE_NOTE_PATTERN = re.compile(rb'\x1b\[8mha:[A-Za-z0-9+/=]*\x1b\[0m')
+
+def generate_topology(jobs=500, running=20, folder_depth=2, folder_fanout=5, nodes=10, users=20, seed=1):
+    """Return {job full name: job} with `running` jobs building, spread over nested folders"""
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    running_jobs = set(rng.sample(range(jobs), min(running, jobs)))
+
+    topology = {}
+    for i in range(jobs):
+        folders = [f'folder{rng.randrange(folder_fanout)}' for _ in range(rng.randint(0, folder_depth))]
+        full_name = '/'.join(folders + [f'job{i}'])
+        building = i in running_jobs
+        number = rng.randint(1, 500)
+        topology[full_name] = {
+            'color': ('blue_anime' if building else rng.choice(IDLE_COLORS)),
+            'builds': [{
+                'number': number,
+                'building': building,
+                'timestamp': now - rng.randint(1, 180) * 60000,
+                'estimatedDuration': rng.randint(5, 60) * 60000,
+                'builtOn': f'node{rng.randrange(nodes)}',
+                'fullDisplayName': f'{full_name} #{number}',
+                'description': None,
+                'actions': [{
+                    '_class': 'hudson.model.CauseAction',
+                    'causes': [{'_class': 'hudson.model.Cause$UserIdCause',
+                                'userId': f'user{rng.randrange(users)}',
+                                'userName': f'User {i % users}'}]
+                }]
+            }]
+        }
+    return topology
+
+def log_size(build, now=None):
+    """Bytes of console log a build has written so far"""
+    end = (now or time.time()) * 1000 if build['building'] else build['timestamp'] + build['estimatedDuration']
+    return max(0, int((end - build['timestamp']) / 1000 * LOG_LINES_PER_SECOND)) * LOG_LINE_BYTES
+
+def log_bytes(full_name, build, start, end):
+    """Bytes [start, end) of a build's generated console log, as stored (notes included)"""
+    first, last = start // LOG_LINE_BYTES, -(-end // LOG_LINE_BYTES)
+    prefix = f"{full_name} #{build['number']}"
+    lines = []
+    for i in range(first, last):
+        note = CONSOLE_NOTE if i % 4 == 0 else b''
+        width = LOG_LINE_BYTES - 1 - len(note)
+        lines.append(note + f'{f"[{i:08d}] {prefix} step {i}":<{width}.{width}}\n'.encode())
+    offset = start - first * LOG_LINE_BYTES
+    return b''.join(lines)[offset:offset + end - start]
+
+def node_pool(node):
+    """Label shared by a third of the generated nodes"""
+    return f'pool{int(node.lstrip("node") or 0) % 3}'
+
+def generate_queue(topology, queued=0, users=20, seed=1):
+    """Return `queued` build queue items for random jobs of the topology"""
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    names = list(topology)
+    causes = [('Started by timer', None), ('Started by an SCM change', None), ('Started by user', 'user')]
+    items = []
+    for item_id in range(1, queued + 1):
+        full_name = rng.choice(names)
+        description, user = rng.choice(causes)
+        cause = {'_class': 'hudson.model.Cause$UserIdCause', 'shortDescription': f'{description} {user}{item_id % users}',
+                 'userId': f'{user}{item_id % users}'} if user else \
+                {'_class': 'hudson.triggers.TimerTrigger$TimerTriggerCause', 'shortDescription': description}
+        items.append({
+            '_class': 'hudson.model.Queue$BuildableItem',
+            'id': item_id,
+            'inQueueSince': now - rng.randint(1, 240) * 60000,
+            'why': f"Waiting for next available executor on ‘{node_pool(topology[full_name]['builds'][0]['builtOn'])}’",
+            'stuck': False,
+            'blocked': False,
+            'buildable': True,
+            'task': {'_class': 'hudson.model.FreeStyleProject', 'name': full_name.split('/')[-1],
+                     'url': f'{job_path(full_name)}/'},
+            'actions': [{'_class': 'hudson.model.CauseAction', 'causes': [cause]}]
+        })
+    return items
+
+def job_path(full_name):
+    return ''.join(f'/job/{name}' for name in full_name.split('/'))
+
+def job_summary(job):
+    completed = [b['number'] for b in job['builds'] if not b['building']]
+    return {'color': job['color'], 'lastBuild': {'number': job['builds'][0]['number']},
+            'lastCompletedBuild': {'number': completed[0]} if completed else None}
+
+class FakeJenkinsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, topology, latency=0.0, latency_jitter=0.0, error_rate=0.0, seed=1, queue=(),
+                 executors=4):
+        super().__init__(address, FakeJenkinsHandler)
+        self.base_url = f'http://{self.server_address[0]}:{self.server_address[1]}'
+        self.topology = topology
+        self.initial_queue = list(queue)
+        self.queue = {item['id']: item for item in queue}
+        self.nodes = sorted({job['builds'][0]['builtOn'] for job in topology.values()})
+        self.executors = executors
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.folders = {}
+        for full_name in topology:
+            node = self.folders
+            for name in full_name.split('/')[:-1]:
+                node = node.setdefault(name, {})
+            node[full_name.split('/')[-1]] = full_name
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.queue = {item['id']: item for item in self.initial_queue}
+            for job in self.topology.values():
+                if job['color'] == 'aborted' and job.get('stopped'):
+                    job['color'] = 'blue_anime'
+                    job['builds'][0]['building'] = True
+                    del job['stopped']
+
+class FakeJenkinsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def inject(self, kind):
+        """Count the request, sleep the configured latency and maybe fail it; True if it failed"""
+        server = self.server
+        with server.lock:
+            server.counts[kind] += 1
+            server.counts['total'] += 1
+            delay = server.latency + server.rng.uniform(0, server.latency_jitter)
+            failed = server.rng.random() < server.error_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            with server.lock:
+                server.counts['errors'] += 1
+            self.send_json({'message': 'injected error'}, 500)
+        return failed
+
+    def build_body(self, full_name, build):
+        return {'_class': 'hudson.model.FreeStyleBuild',
+                'url': f'{self.server.base_url}{job_path(full_name)}/{build["number"]}/', **build}
+
+    def render_jobs(self, node, prefix, levels, builds_limit):
+        """Render one folder level the way a tree=jobs[...] query would"""
+        jobs = []
+        for name, child in node.items():
+            if levels <= 0:
+                # Past the requested depth Jenkins only returns the class of each child
+                jobs.append({'_class': 'hudson.model.FreeStyleProject'})
+                continue
+            full_name = f'{prefix}{name}'
+            entry = {'name': name, 'fullName': full_name, 'url': f'{self.server.base_url}{job_path(full_name)}/'}
+            if isinstance(child, dict):
+                entry['_class'] = 'com.cloudbees.hudson.plugins.folder.Folder'
+                entry['jobs'] = self.render_jobs(child, f'{full_name}/', levels - 1, builds_limit)
+            else:
+                job = self.server.topology[child]
+                entry['_class'] = 'hudson.model.FreeStyleProject'
+                entry.update(job_summary(job))
+                if builds_limit:
+                    entry['builds'] = [self.build_body(child, b) for b in job['builds'][:builds_limit]]
+            jobs.append(entry)
+        return jobs
+
+    def builds_limit(self, tree):
+        if 'builds[' not in tree:
+            return 0
+        limit = re.search(r'\{\d*,(\d+)\}', tree)
+        return int(limit.group(1)) if limit else 100
+
+    def render_tree_query(self, node, prefix):
+        tree = parse_qs(urlparse(self.path).query).get('tree', [''])[0]
+        levels = tree.count('jobs[') or 1
+        return {'jobs': self.render_jobs(node, prefix, levels, self.builds_limit(tree))}
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path).rstrip('/')
+        server = self.server
+
+        if path == '/_fake/stats':
+            with server.lock:
+                return self.send_json(dict(server.counts))
+        if path.startswith('/crumbIssuer'):
+            if not self.inject('crumb'):
+                self.send_json({}, 404)
+            return
+        if path == '/me/api/json':
+            if not self.inject('whoami'):
+                self.send_json({'id': 'bench', 'fullName': 'Benchmark'})
+            return
+        if path == '/api/json':
+            if not self.inject('root'):
+                self.send_json(self.render_tree_query(server.folders, ''))
+            return
+        if path == '/queue/api/json':
+            if self.inject('queue'):
+                return
+            with server.lock:
+                items = [{**item, 'task': {**item['task'], 'url': server.base_url + item['task']['url']}}
+                         for item in server.queue.values()]
+            return self.send_json({'items': items})
+        if path == '/computer/api/json':
+            if self.inject('computer'):
+                return
+            computers = {name: [] for name in server.nodes}
+            for full_name, job in server.topology.items():
+                build = job['builds'][0]
+                if build['building']:
+                    computers.setdefault(build['builtOn'], []).append(
+                        {'idle': False, 'currentExecutable': self.build_body(full_name, build)})
+            return self.send_json({'computer': [
+                {'displayName': name, 'offline': False, 'temporarilyOffline': False,
+                 'numExecutors': max(server.executors, len(executors)),
+                 'assignedLabels': [{'name': name}, {'name': node_pool(name)}],
+                 'executors': executors + [{'idle': True, 'currentExecutable': None}] *
+                              (server.executors - len(executors)),
+                 'oneOffExecutors': []}
+                for name, executors in sorted(computers.items())
+            ]})
+
+        match = re.match(r'^((?:/job/[^/]+)+)/(\d+)/logText/progressiveText$', path)
+        if match:
+            if self.inject('log'):
+                return
+            full_name = '/'.join(match.group(1).split('/job/')[1:])
+            build = next((b for b in (server.topology.get(full_name) or {}).get('builds', [])
+                          if b['number'] == int(match.group(2))), None)
+            if build is None:
+                return self.send_json({}, 404)
+            size = log_size(build)
+            start = int(parse_qs(urlparse(self.path).query).get('start', ['0'])[0])
+            # Like Jenkins, a start past the end means the log was rewritten: send it all
+            start = 0 if start > size else start
+            # Jenkins renders all of it before sending the headers, however little is read
+            data = CONSOLE_NOTE_PATTERN.sub(b'', log_bytes(full_name, build, start, size))
+            with server.lock:
+                server.counts['log_rendered_bytes'] += size - start
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain;charset=UTF-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('X-Text-Size', str(size))
+            if build['building']:
+                self.send_header('X-More-Data', 'true')
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # The backend hangs up once it has read the headers of a log it won't download
+                self.close_connection = True
+                return
+            with server.lock:
+                server.counts['log_bytes'] += len(data)
+            return
+
+        match = re.match(r'^((?:/job/[^/]+)+)(?:/(\d+))?/api/json$', path)
+        if not match:
+            return self.send_json({}, 404)
+        full_name = '/'.join(match.group(1).split('/job/')[1:])
+
+        if match.group(2):
+            if self.inject('build'):
+                return
+            job = server.topology.get(full_name)
+            for build in (job or {}).get('builds', []):
+                if build['number'] == int(match.group(2)):
+                    return self.send_json(self.build_body(full_name, build))
+            return self.send_json({}, 404)
+
+        if self.inject('job'):
+            return
+        job = server.topology.get(full_name)
+        if job is not None:
+            body = {'_class': 'hudson.model.FreeStyleProject', 'name': full_name.split('/')[-1],
+                    'fullName': full_name, **job_summary(job)}
+            limit = self.builds_limit(parse_qs(urlparse(self.path).query).get('tree', [''])[0])
+            if limit:
+                body['builds'] = [self.build_body(full_name, b) for b in job['builds'][:limit]]
+            return self.send_json(body)
+        node = server.folders
+        for name in full_name.split('/'):
+            node = node.get(name) if isinstance(node, dict) else None
+        if not isinstance(node, dict):
+            return self.send_json({}, 404)
+        self.send_json(self.render_tree_query(node, f'{full_name}/'))
+
+    def do_POST(self):
+        path = unquote(urlparse(self.path).path).rstrip('/')
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if path == '/_fake/reset':
+            server.reset()
+            return self.send_json({})
+        if path == '/queue/cancelItem':
+            if self.inject('cancel_queue'):
+                return
+            item_id = parse_qs(urlparse(self.path).query).get('id', ['0'])[0]
+            with server.lock:
+                server.queue.pop(int(item_id), None)
+            # Like Jenkins (JENKINS-21311), answer the cancel with a 404
+            return self.send_json({}, 404)
+
+        match = re.match(r'^((?:/job/[^/]+)+)/(\d+)/stop$', path)
+        if not match:
+            return self.send_json({}, 404)
+        if self.inject('stop'):
+            return
+        full_name = '/'.join(match.group(1).split('/job/')[1:])
+        job = server.topology.get(full_name)
+        with server.lock:
+            for build in (job or {}).get('builds', []):
+                if build['number'] == int(match.group(2)) and build['building']:
+                    build['building'] = False
+                    job.update(color='aborted', stopped=True)
+        self.send_json({})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--jobs', type=int, default=500)
+    parser.add_argument('--running', type=int, default=20)
+    parser.add_argument('--folder-depth', type=int, default=2)
+    parser.add_argument('--folder-fanout', type=int, default=5)
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--executors', type=int, default=4, help='executors per node')
+    parser.add_argument('--queued', type=int, default=0, help='items waiting in the build queue')
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every request')
+    parser.add_argument('--latency-jitter', type=float, default=0, help='random extra milliseconds, up to this')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    topology = generate_topology(args.jobs, args.running, args.folder_depth, args.folder_fanout,
+                                 args.nodes, seed=args.seed)
+    server = FakeJenkinsServer((args.host, args.port), topology, args.latency / 1000,
+                               args.latency_jitter / 1000, args.error_rate, args.seed,
+                               generate_queue(topology, args.queued, seed=args.seed), args.executors)
+    print(f'Fake Jenkins with {args.jobs} jobs ({args.running} running) on {server.base_url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
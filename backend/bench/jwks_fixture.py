@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Sign Cognito-style tokens against a throwaway JWKS and check the key cache.
+
+The signing key is generated on first use into a fixture directory: jwks.json holds its
+public half, the one the app verifies with (point COGNITO_JWKS_URL at it), and
+jwks_private.pem the private half used here to sign. No key is kept in the repository.
+
+    python bench/jwks_fixture.py token --username alice --dir /tmp/jwks  # print a signed access token
+    python bench/jwks_fixture.py check --burst 50                        # verify tokens through the app
+
+token reuses the key already in --dir, so the app keeps accepting the tokens it prints.
+check verifies a burst of tokens at once with an empty cache and reports how many
+times the JWKS was fetched (once), then how a token with an unknown kid is handled.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_KID = 'stopjob-fixture'
+
+def write_fixture(directory):
+    """Generate the signing key into directory unless it is already there; returns the JWKS path"""
+    jwks_path = os.path.join(directory, 'jwks.json')
+    key_path = os.path.join(directory, 'jwks_private.pem')
+    if os.path.exists(jwks_path) and os.path.exists(key_path):
+        return jwks_path
+
+    os.makedirs(directory, exist_ok=True)
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    with open(os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+        f.write(pem)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    with open(jwks_path, 'w') as f:
+        json.dump({'keys': [{**jwk, 'kid': FIXTURE_KID, 'alg': 'RS256', 'use': 'sig'}]}, f, indent=2)
+    return jwks_path
+
+def load_app(jwks_path):
+    """Import the app configured to verify tokens against the fixture JWKS"""
+    os.environ.update({'COGNITO_JWKS_URL': jwks_path, 'REQUIRE_AUTH': 'true'})
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+    return app
+
+def sign_token(key_path, issuer, username, kid=FIXTURE_KID, ttl=3600, client_id='stopjob-fixture-client'):
+    """Return an access token shaped like the ones Cognito issues"""
+    with open(key_path) as f:
+        private_key = f.read()
+    now = int(time.time())
+    claims = {
+        'sub': f'{username}-sub',
+        'username': username,
+        'client_id': client_id,
+        'token_use': 'access',
+        'scope': 'openid email',
+        'iss': issuer,
+        'iat': now,
+        'exp': now + ttl,
+    }
+    return jwt.encode(claims, private_key, algorithm='RS256', headers={'kid': kid})
+
+def check(app, key_path, burst):
+    """Verify a burst of fresh tokens and a token with an unknown kid, counting JWKS fetches"""
+    fetches = []
+    fetch_jwks = app.fetch_jwks
+
+    def counting_fetch():
+        fetches.append(time.time())
+        time.sleep(0.2)  # a slow Cognito makes overlapping refreshes easy to spot
+        return fetch_jwks()
+
+    app.fetch_jwks = counting_fetch
+    tokens = [sign_token(key_path, app.COGNITO_ISSUER, f'user{i}') for i in range(burst)]
+    results = [None] * burst
+
+    def verify(i):
+        results[i] = app.verify_cognito_token(tokens[i])
+
+    threads = [threading.Thread(target=verify, args=(i,)) for i in range(burst)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    verified = sum(1 for claims in results if claims and claims['username'].startswith('user'))
+    print(f'burst of {burst} new tokens: {verified} verified, {len(fetches)} JWKS fetch(es)')
+
+    start = time.perf_counter()
+    app.verify_cognito_token(tokens[0])
+    print(f'same token again: {(time.perf_counter() - start) * 1000:.2f}ms (token cache)')
+
+    unknown = sign_token(key_path, app.COGNITO_ISSUER, 'rotated', kid='rotated-kid')
+    before = len(fetches)
+    rejected = app.verify_cognito_token(unknown) is None
+    print(f'unknown kid: {"rejected" if rejected else "accepted"}, '
+          f'{len(fetches) - before} JWKS fetch(es) (refresh limited to every '
+          f'{app.JWKS_REFRESH_MIN_INTERVAL:g}s)')
+    return verified == burst and len(fetches) == 1 and rejected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    token = commands.add_parser('token', help='print a signed access token')
+    token.add_argument('--username', default='fixture-user')
+    token.add_argument('--ttl', type=int, default=3600, help='seconds until the token expires')
+    token.add_argument('--kid', default=FIXTURE_KID)
+    token.add_argument('--dir', default=os.path.join(tempfile.gettempdir(), 'stopjob-jwks-fixture'),
+                       help='fixture directory, the key in it is generated on first use')
+    burst = commands.add_parser('check', help='verify tokens through the app against a fresh key')
+    burst.add_argument('--burst', type=int, default=50, help='tokens verified at once')
+    args = parser.parse_args()
+
+    if args.command == 'token':
+        jwks_path = write_fixture(args.dir)
+        app = load_app(jwks_path)
+        print(sign_token(os.path.join(args.dir, 'jwks_private.pem'), app.COGNITO_ISSUER, args.username,
+                         args.kid, args.ttl))
+        print(f'COGNITO_JWKS_URL={jwks_path}', file=sys.stderr)
+        return
+    with tempfile.TemporaryDirectory(prefix='stopjob-jwks-') as directory:
+        app = load_app(write_fixture(directory))
+        if not check(app, os.path.join(directory, 'jwks_private.pem'), args.burst):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Benchmark the backend against a generated fake Jenkins (see fake_jenkins.py).
+
+Runs three phases and prints latency percentiles, Jenkins requests per call and memory:
+
+  discovery  one scan of Jenkins per pass, for every mode in --modes
+  builds     concurrent GET /api/user/builds served from the background snapshot
+  cancel     concurrent POST .../cancel on the running builds
+
+With --controllers N, N fake controllers are federated and a fourth phase times whole
+snapshot refreshes across them (the last controller can be made slow); the other phases
+run against the first controller.
+
+The app runs in this process on a local server; the fake Jenkins runs in a child
+process so its work doesn't compete with the app for the GIL.
+
+    python bench/run_bench.py --jobs 2000 --running 100 --latency 20 --clients 32
+    python bench/run_bench.py --modes tree,walk --error-rate 0.02 --json results.json
+    python bench/run_bench.py --controllers 3 --slow-controller-latency 2000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def percentiles(samples):
+    """Summarise durations in seconds as milliseconds"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+    return {'count': len(ordered), 'p50': pick(50), 'p95': pick(95), 'p99': pick(99),
+            'max': ordered[-1] * 1000}
+
+def rss_mb():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def start_fake_jenkins(args, latency=None, seed=None):
+    """Start fake_jenkins.py in a child process and return (process, base URL)"""
+    command = [sys.executable, os.path.join(BENCH_DIR, 'fake_jenkins.py'), '--port', '0',
+               '--jobs', str(args.jobs), '--running', str(args.running), '--queued', str(args.queued),
+               '--folder-depth', str(args.folder_depth), '--folder-fanout', str(args.folder_fanout),
+               '--latency', str(args.latency if latency is None else latency),
+               '--latency-jitter', str(args.latency_jitter), '--error-rate', str(args.error_rate),
+               '--seed', str(args.seed if seed is None else seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline()
+    if ' on ' not in banner:
+        process.kill()
+        raise RuntimeError(f'fake Jenkins failed to start: {banner!r}')
+    return process, banner.rsplit(' on ', 1)[1].strip()
+
+def jenkins_stats(jenkins_url, reset=False):
+    """Return the fake Jenkins request counters, optionally clearing them first"""
+    if reset:
+        requests.post(f'{jenkins_url}/_fake/reset', timeout=10)
+        return Counter()
+    return Counter(requests.get(f'{jenkins_url}/_fake/stats', timeout=10).json())
+
+def run_concurrently(clients, tasks, fn):
+    """Call fn(task) from `clients` threads; return per-call durations and status counts"""
+    durations, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def timed(task):
+        start = time.perf_counter()
+        try:
+            status = fn(task)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            durations.append(elapsed)
+            statuses[status] += 1
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(timed, tasks))
+    return durations, statuses
+
+def bench_discovery(app, jenkins_url, modes, passes):
+    results = {}
+    for mode in modes:
+        app.DISCOVERY_MODE = mode
+        durations, requests_per_pass, found, complete = [], [], [], 0
+        for _ in range(passes):
+            jenkins_stats(jenkins_url, reset=True)
+            start = time.perf_counter()
+            builds, is_complete = app.get_all_running_builds()
+            durations.append(time.perf_counter() - start)
+            requests_per_pass.append(jenkins_stats(jenkins_url)['total'])
+            found.append(len(builds))
+            complete += is_complete
+        results[mode] = {
+            'latency_ms': percentiles(durations),
+            'jenkins_requests_per_pass': sum(requests_per_pass) / passes,
+            'builds_found': max(found),
+            'complete_passes': complete,
+            'rss_mb': rss_mb()
+        }
+    return results
+
+def bench_federation(app, passes, interval):
+    """Time whole snapshot refreshes across every controller, and how fresh each slice stays"""
+    durations, stale = [], Counter()
+    for i in range(passes):
+        if i:
+            # Like the poller, give late scans until the next poll to finish
+            time.sleep(interval)
+        start = time.perf_counter()
+        app.refresh_builds_snapshot()
+        durations.append(time.perf_counter() - start)
+        for name, controller in app.builds_snapshot['controllers'].items():
+            stale[name] += controller['stale']
+    return {
+        'latency_ms': percentiles(durations),
+        'controllers': {name: {'builds': c['count'], 'stale_passes': stale[name], 'scan_seconds': c['scan_seconds']}
+                        for name, c in app.builds_snapshot['controllers'].items()},
+        'builds': len(app.builds_snapshot['builds']),
+        'rss_mb': rss_mb()
+    }
+
+def bench_builds(base_url, jenkins_url, clients, total, etag_ratio):
+    session = requests.Session()
+    first = session.get(f'{base_url}/api/user/builds', timeout=60)
+    first.raise_for_status()
+    etag = first.headers.get('ETag')
+    local = threading.local()
+
+    def fetch(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        headers = {'If-None-Match': etag} if etag and i % 100 < etag_ratio * 100 else {}
+        return local.session.get(f'{base_url}/api/user/builds', headers=headers, timeout=60).status_code
+
+    jenkins_stats(jenkins_url, reset=True)
+    start = time.perf_counter()
+    durations, statuses = run_concurrently(clients, range(total), fetch)
+    elapsed = time.perf_counter() - start
+    jenkins_requests = jenkins_stats(jenkins_url)['total']
+    return {
+        'latency_ms': percentiles(durations),
+        'statuses': dict(statuses),
+        'requests_per_second': total / elapsed,
+        'jenkins_requests': jenkins_requests,
+        'jenkins_requests_per_call': jenkins_requests / total,
+        'builds': first.json()['count'],
+        'response_bytes': len(first.content),
+        'rss_mb': rss_mb()
+    }
+
+def bench_cancel(base_url, jenkins_url, clients, limit):
+    # Only the first controller's Jenkins requests are counted
+    builds = requests.get(f'{base_url}/api/user/builds?controller=jenkins0', timeout=60).json()['builds'][:limit]
+    local = threading.local()
+
+    def cancel(build):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        job_path = '/'.join(quote(part, safe='') for part in build['job_name'].split('/'))
+        return local.session.post(f"{base_url}/api/builds/{job_path}/{build['build_number']}/cancel",
+                                  json={'reason': 'benchmark', 'controller': build['controller']}, timeout=60).status_code
+
+    jenkins_stats(jenkins_url, reset=True)
+    durations, statuses = run_concurrently(clients, builds, cancel)
+    counts = jenkins_stats(jenkins_url)
+    # Put the stopped builds back so a later run sees the same topology
+    jenkins_stats(jenkins_url, reset=True)
+    return {
+        'latency_ms': percentiles(durations),
+        'statuses': dict(statuses),
+        'jenkins_requests': counts['total'],
+        'jenkins_requests_per_call': counts['total'] / max(1, len(builds)),
+        'jenkins_requests_by_kind': {k: v for k, v in counts.items() if k not in ('total', 'errors')},
+        'rss_mb': rss_mb()
+    }
+
+def print_results(results):
+    def line(name, r):
+        latency = r['latency_ms']
+        if not latency['count']:
+            return f'  {name:<12} no samples'
+        per_call = r.get('jenkins_requests_per_call', r.get('jenkins_requests_per_pass'))
+        return (f"  {name:<12} n={latency['count']:<6} p50={latency['p50']:8.1f}ms p95={latency['p95']:8.1f}ms "
+                f"p99={latency['p99']:8.1f}ms  jenkins req/call={per_call:8.2f}  rss={r['rss_mb']:.0f}MB")
+
+    print('discovery (one full scan per pass)')
+    for mode, r in results['discovery'].items():
+        print(line(mode, r) + f"  builds={r['builds_found']} complete={r['complete_passes']}/{r['latency_ms']['count']}")
+    if 'builds' in results:
+        r = results['builds']
+        print(f"GET /api/user/builds ({r['requests_per_second']:.0f} req/s, {r['response_bytes']} bytes, "
+              f"statuses {r['statuses']})")
+        print(line('builds', r))
+    if 'cancel' in results:
+        r = results['cancel']
+        print(f"POST cancel (statuses {r['statuses']}, jenkins {r['jenkins_requests_by_kind']})")
+        print(line('cancel', r))
+    if 'federation' in results:
+        r = results['federation']
+        latency = r['latency_ms']
+        print(f"federated snapshot refresh ({r['builds']} builds)")
+        print(f"  {'refresh':<12} n={latency['count']:<6} p50={latency['p50']:8.1f}ms p95={latency['p95']:8.1f}ms "
+              f"p99={latency['p99']:8.1f}ms  rss={r['rss_mb']:.0f}MB")
+        for name, c in r['controllers'].items():
+            scan = f"{c['scan_seconds']:.2f}s" if c['scan_seconds'] is not None else 'not finished'
+            print(f"  {name:<12} builds={c['builds']} stale={c['stale_passes']}/{latency['count']} last scan={scan}")
+    print(f"memory: start {results['memory']['start_rss_mb']:.0f}MB, end {results['memory']['end_rss_mb']:.0f}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    topology = parser.add_argument_group('fake Jenkins')
+    topology.add_argument('--jobs', type=int, default=1000)
+    topology.add_argument('--running', type=int, default=50)
+    topology.add_argument('--queued', type=int, default=0, help='items waiting in the build queue')
+    topology.add_argument('--folder-depth', type=int, default=2)
+    topology.add_argument('--folder-fanout', type=int, default=5)
+    topology.add_argument('--latency', type=float, default=5, help='milliseconds added to every Jenkins request')
+    topology.add_argument('--latency-jitter', type=float, default=5)
+    topology.add_argument('--error-rate', type=float, default=0)
+    topology.add_argument('--seed', type=int, default=1)
+    topology.add_argument('--controllers', type=int, default=1, help='fake controllers to federate')
+    topology.add_argument('--slow-controller-latency', type=float, default=None,
+                          help='milliseconds added to every request to the last controller')
+    load = parser.add_argument_group('load')
+    load.add_argument('--modes', default='tree,executors,walk', help='discovery modes to compare')
+    load.add_argument('--serve-mode', default=None, help='discovery mode behind the HTTP phases (first of --modes)')
+    load.add_argument('--passes', type=int, default=5, help='discovery passes per mode')
+    load.add_argument('--clients', type=int, default=16)
+    load.add_argument('--requests', type=int, default=1000, help='GET /api/user/builds calls')
+    load.add_argument('--etag-ratio', type=float, default=0.5, help='fraction of GETs revalidating with an ETag')
+    load.add_argument('--cancels', type=int, default=20, help='builds to cancel, 0 to skip')
+    load.add_argument('--poll-interval', type=float, default=5)
+    load.add_argument('--scan-deadline', type=float, default=2, help='seconds a refresh waits for a controller')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help='keep the app INFO logging')
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    controllers = []
+    for i in range(max(1, args.controllers)):
+        slow = i == args.controllers - 1 and i > 0 and args.slow_controller_latency is not None
+        controllers.append(start_fake_jenkins(args, args.slow_controller_latency if slow else None, args.seed + i))
+    jenkins_url = controllers[0][1]
+    state_dir = tempfile.mkdtemp(prefix='stopjob-bench-')
+    server = None
+
+    # The app reads its configuration at import time
+    os.environ.update({
+        'JENKINS_CONTROLLERS': ','.join(f'jenkins{i}={url}' for i, (_, url) in enumerate(controllers)),
+        'CONTROLLER_SCAN_DEADLINE': str(args.scan_deadline),
+        'DISCOVERY_MODE': args.serve_mode or modes[0],
+        'DISCOVERY_FOLDER_DEPTH': str(args.folder_depth),
+        'BUILDS_POLL_INTERVAL': str(args.poll_interval),
+        'SHARED_STATE_DIR': state_dir,
+        'REQUIRE_AUTH': 'false',
+    })
+    for name in ('SLACK_WEBHOOK_TOKEN', 'PROMETHEUS_MULTIPROC_DIR'):
+        os.environ.pop(name, None)
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    import app
+    from werkzeug.serving import make_server
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    results = {'config': vars(args), 'memory': {'start_rss_mb': rss_mb()}}
+    try:
+        # Discovery runs before any HTTP request, so the background poller isn't competing
+        results['discovery'] = bench_discovery(app, jenkins_url, modes, args.passes)
+        if len(controllers) > 1:
+            results['federation'] = bench_federation(app, args.passes, args.poll_interval)
+
+        app.DISCOVERY_MODE = args.serve_mode or modes[0]
+        server = make_server('127.0.0.1', 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        results['builds'] = bench_builds(base_url, jenkins_url, args.clients, args.requests, args.etag_ratio)
+        if args.cancels:
+            results['cancel'] = bench_cancel(base_url, jenkins_url, args.clients, args.cancels)
+        results['memory']['end_rss_mb'] = rss_mb()
+    finally:
+        if server is not None:
+            server.shutdown()
+        app.begin_shutdown()
+        app.finish_shutdown()
+        for process, _ in controllers:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
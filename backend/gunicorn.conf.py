@@ -0,0 +1,71 @@
+# Gunicorn settings for the web backend, tuned through environment variables
+import os
+import shutil
+import signal
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Build and log streams stay open for as long as a page does. gevent workers serve every
+# request on a greenlet, so an open stream costs a socket rather than a thread; with
+# GUNICORN_WORKER_CLASS=gthread each stream holds one of GUNICORN_THREADS threads instead.
+# Blocking C calls (the sqlite audit database) go through run_blocking in app.py, which
+# moves them off the gevent event loop
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# Streams past this many per worker are turned away, keeping connections (or threads)
+# free for cancels, health checks and /metrics
+if not os.getenv('STREAM_MAX_CLIENTS'):
+    os.environ['STREAM_MAX_CLIENTS'] = str(
+        worker_connections - 100 if worker_class == 'gevent' else max(1, threads - 4))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# Time given to in-flight requests (cancels in particular) to finish on shutdown
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+# Each worker keeps its Prometheus samples here so /metrics can report all of them;
+# it has to be set before the app (and prometheus_client) is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'jenkins-stopjob-metrics'))
+
+
+def on_starting(server):
+    """Start every run with empty metrics"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """End streams and background polling as soon as the worker is told to stop"""
+    from app import begin_shutdown
+
+    handle_exit = worker.handle_exit
+
+    def on_term(sig, frame):
+        begin_shutdown()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def worker_exit(server, worker):
+    """Release shared state once in-flight requests have drained"""
+    from app import finish_shutdown
+
+    finish_shutdown()
+
+
+def child_exit(server, worker):
+    """Drop the live samples of a worker that has gone away"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
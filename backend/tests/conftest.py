@@ -0,0 +1,124 @@
+"""Run the backend against bench/fake_jenkins.py, configured before the app is imported.
+
+    pip install -r requirements-test.txt
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+
+import fake_jenkins  # noqa: E402
+
+RUNNING_BUILDS = 20
+QUEUED_ITEMS = 10
+
+# One Jenkins for the whole session: the app reads its configuration once, on import
+topology = fake_jenkins.generate_topology(jobs=200, running=RUNNING_BUILDS, folder_depth=2, folder_fanout=3)
+server = fake_jenkins.FakeJenkinsServer(('127.0.0.1', 0), topology,
+                                        queue=fake_jenkins.generate_queue(topology, QUEUED_ITEMS))
+threading.Thread(target=server.serve_forever, name='fake-jenkins', daemon=True).start()
+
+state_dir = tempfile.mkdtemp(prefix='stopjob-tests-')
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+os.environ.pop('JENKINS_CONTROLLERS', None)
+os.environ.update({
+    'JENKINS_URL': server.base_url,
+    'SHARED_STATE_DIR': state_dir,
+    'AUDIT_DB_PATH': os.path.join(state_dir, 'audit.db'),
+    'REQUIRE_AUTH': 'false',
+    # Tests refresh the snapshot themselves, the poller only takes the first one
+    'BUILDS_POLL_INTERVAL': '3600',
+    'LOG_TAIL_INTERVAL': '0',
+    'LOG_TAIL_BYTES': '4096',
+    'BUILDS_PAGE_MAX': '50',
+})
+
+import app as backend  # noqa: E402
+
+
+def wait_until(condition, timeout=10):
+    """Poll until condition() is true, failing the test after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out waiting for the backend'
+        time.sleep(0.05)
+
+
+def running_keys():
+    """(job, number) of every build the fake Jenkins is running"""
+    return {(name, job['builds'][0]['number']) for name, job in server.topology.items()
+            if job['builds'][0]['building']}
+
+
+def refresh_snapshot():
+    """Have the poller take a new snapshot now and wait until it shows what Jenkins runs and queues"""
+    expected = running_keys(), set(server.queue)
+    previous = backend.builds_snapshot['updated_at']
+
+    def refreshed():
+        snapshot = backend.builds_snapshot
+        return snapshot['updated_at'] != previous and expected == (
+            {(b['job_name'], b['build_number']) for b in snapshot['builds']},
+            {i['id'] for i in snapshot['queue']['items']})
+
+    backend.refresh_requested.set()
+    wait_until(refreshed)
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The backend with its first snapshot taken, shut down like a worker at the end"""
+    backend.get_builds_snapshot()
+    wait_until(backend.snapshot_ready.is_set)
+    yield backend
+    backend.finish_shutdown()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def jenkins(app_module):
+    """The fake Jenkins; builds a test starts or stops are put back afterwards, with the snapshot"""
+    saved = {name: (job['color'], job['builds'][0]['building']) for name, job in server.topology.items()}
+    server.counts.clear()
+    yield server
+    server.reset()
+    for name, (color, building) in saved.items():
+        job = server.topology[name]
+        job['color'] = color
+        job['builds'][0]['building'] = building
+        job.pop('stopped', None)
+    for controller in app_module.jenkins_controllers.values():
+        controller['discovery']['job_summaries'].clear()
+    refresh_snapshot()
+
+
+def start_build(name):
+    """Make an idle job of the fake Jenkins build again"""
+    job = server.topology[name]
+    job['color'] = 'blue_anime'
+    job['builds'][0]['building'] = True
+
+
+@pytest.fixture
+def running(jenkins):
+    """Running builds of the fake Jenkins as {job name: build}"""
+    return {name: job['builds'][0] for name, job in jenkins.topology.items() if job['builds'][0]['building']}
+
+
+@pytest.fixture
+def idle(jenkins):
+    """Job names of the fake Jenkins that are not building"""
+    return sorted(name for name, job in jenkins.topology.items() if not job['builds'][0]['building'])
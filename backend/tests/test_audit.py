@@ -0,0 +1,35 @@
+"""Cancellation audit log and its stats"""
+
+
+def test_cancel_is_audited(app_module, client, running):
+    job_name, build = next(iter(running.items()))
+    response = client.post(f"/api/builds/{job_name}/{build['number']}/cancel", json={'reason': 'audit test'})
+    assert response.status_code == 200
+    app_module.drain_audit_queue(5)
+
+    records = client.get(f'/api/audit?job={job_name}').json['records']
+    assert [(r['job_name'], r['build_number'], r['reason']) for r in records] == \
+        [(job_name, build['number'], 'audit test')]
+    assert records[0]['node'] == build['builtOn']
+
+    stats = client.get(f'/api/audit/stats?job={job_name}&group_by=user').json
+    assert stats['builds'] == 1
+    assert stats['groups'][0]['user'] == records[0]['cancelled_by']
+
+
+def test_audit_pages_with_a_cursor(app_module, client, running):
+    for job_name, build in list(running.items())[:3]:
+        client.post(f"/api/builds/{job_name}/{build['number']}/cancel", json={'reason': 'audit paging'})
+    app_module.drain_audit_queue(5)
+    everything = client.get('/api/audit').json['records']
+    first = client.get('/api/audit?limit=2').json
+    second = client.get(f"/api/audit?limit=2&cursor={first['next_cursor']}").json
+    assert first['records'] + second['records'] == everything[:4]
+
+
+def test_bad_audit_queries_are_rejected(app_module, client):
+    assert client.get('/api/audit?limit=5000').status_code == 400
+    assert client.get('/api/audit?since=yesterday').status_code == 400
+    assert client.get('/api/audit/stats?group_by=nope').status_code == 400
+    cursor = app_module.encode_cursor('audit', ['soon', 1])
+    assert client.get(f'/api/audit?cursor={cursor}').status_code == 400
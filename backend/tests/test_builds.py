@@ -0,0 +1,102 @@
+"""Running builds list: filters, cursor pagination and revalidation"""
+
+import pytest
+
+from conftest import RUNNING_BUILDS, refresh_snapshot
+
+
+def build_keys(builds):
+    return [(b['job_name'], b['build_number']) for b in builds]
+
+
+def test_lists_every_running_build(client, running):
+    body = client.get('/api/user/builds').json
+    assert body['complete'] is True
+    assert body['total'] == RUNNING_BUILDS
+    assert sorted(build_keys(body['builds'])) == sorted((name, b['number']) for name, b in running.items())
+
+
+def test_fields_keep_the_build_key(client):
+    builds = client.get('/api/user/builds?fields=node&limit=3').json['builds']
+    assert len(builds) == 3
+    assert all(set(b) == {'job_name', 'build_number', 'node'} for b in builds)
+
+
+@pytest.mark.parametrize('sort', ['job', 'started', '-started', 'overrun'])
+def test_cursor_pages_cover_the_sorted_list_once(client, app_module, sort):
+    everything = client.get(f'/api/user/builds?sort={sort}').json['builds']
+    seen, cursor = [], None
+    while True:
+        body = client.get(f'/api/user/builds?sort={sort}&limit=6' + (f'&cursor={cursor}' if cursor else '')).json
+        assert body['total'] == RUNNING_BUILDS
+        seen += body['builds']
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert build_keys(seen) == build_keys(everything)
+    assert build_keys(seen) == build_keys(sorted(everything, key=app_module.BUILD_SORTS[sort]))
+
+
+def test_filtered_pages(client):
+    node = client.get('/api/user/builds').json['builds'][0]['node']
+    expected = [b for b in client.get('/api/user/builds').json['builds'] if b['node'] == node]
+    first = client.get(f'/api/user/builds?node={node}&limit=1').json
+    assert first['total'] == len(expected)
+    assert build_keys(first['builds']) == build_keys(expected[:1])
+
+
+@pytest.mark.parametrize('query, error', [
+    ('sort=nope', 'sort must be one of'),
+    ('limit=0', 'limit must be between'),
+    ('limit=51', 'limit must be between'),
+    ('limit=abc', 'limit must be between'),
+    ('min_age=soon', 'min_age must be'),
+    ('fields=nope', 'Unknown fields'),
+    ('cursor=zzz', 'Invalid cursor'),
+])
+def test_bad_queries_are_rejected(client, query, error):
+    response = client.get(f'/api/user/builds?{query}')
+    assert response.status_code == 400
+    assert error in response.json['error']
+
+
+@pytest.mark.parametrize('sort, key, error', [
+    # A cursor from another sort order
+    ('job', ['folder0/job1', 1, 'jenkins'], 'different sort order'),
+    # Keys of the right sort but the wrong shape
+    ('started', ['folder0/job1', 1], 'Invalid cursor'),
+    ('started', [1, 'folder0/job1', 'one', 'jenkins'], 'Invalid cursor'),
+    ('started', {'start_time': 1}, 'Invalid cursor'),
+    ('started', None, 'Invalid cursor'),
+])
+def test_cursors_that_do_not_fit_the_sort_are_rejected(client, app_module, sort, key, error):
+    cursor = app_module.encode_cursor(sort, key)
+    response = client.get(f'/api/user/builds?sort=started&cursor={cursor}')
+    assert response.status_code == 400
+    assert error in response.json['error']
+
+
+def test_unchanged_list_revalidates_with_304(client):
+    first = client.get('/api/user/builds?limit=5')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/api/user/builds?limit=5', headers={'If-None-Match': etag}).status_code == 304
+    # The body depends on the query, so does the validator
+    assert client.get('/api/user/builds?limit=6', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_weak_validator_from_the_proxy_revalidates_with_304(client):
+    # nginx turns the ETag into a weak one when it gzips the body
+    etag = client.get('/api/user/builds?limit=5').headers['ETag']
+    assert client.get('/api/user/builds?limit=5', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get('/api/user/builds?limit=6', headers={'If-None-Match': f'W/{etag}'}).status_code == 200
+
+
+def test_cancelled_build_changes_the_validator(client, running):
+    etag = client.get('/api/user/builds').headers['ETag']
+    job_name, build = next(iter(running.items()))
+    response = client.post(f"/api/builds/{job_name}/{build['number']}/cancel", json={'reason': 'tests'})
+    assert response.status_code == 200
+    assert build['building'] is False
+    refresh_snapshot()
+    assert client.get('/api/user/builds', headers={'If-None-Match': etag}).status_code == 200
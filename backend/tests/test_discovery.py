@@ -0,0 +1,119 @@
+"""Incremental discovery and the run events Jenkins pushes to /api/jenkins/events"""
+
+import time
+
+import pytest
+
+from conftest import RUNNING_BUILDS, refresh_snapshot, running_keys, start_build, wait_until
+
+EVENTS_TOKEN = 'tests-events-token'
+
+
+def discovery_state():
+    """Discovery state of a controller nothing has been learned about yet"""
+    return {'job_summaries': {}, 'job_builds': {}, 'last_summary_scan': 0, 'last_event': None,
+            'pending': {'started': set(), 'completed': set()}}
+
+
+def discover(app_module, state):
+    builds, complete = app_module.discover_builds_incremental(app_module.get_jenkins_client(), state)
+    assert complete
+    return {(b['job_name'], b['build_number']) for b in builds}
+
+
+def test_first_pass_reads_every_job_in_one_request(app_module, jenkins):
+    assert discover(app_module, discovery_state()) == running_keys()
+    assert jenkins.counts['root'] == 1
+    assert jenkins.counts['job'] == 0
+
+
+def test_without_events_every_pass_compares_summaries(app_module, jenkins, idle):
+    state = discovery_state()
+    discover(app_module, state)
+    start_build(idle[0])
+    jenkins.counts.clear()
+    assert discover(app_module, state) == running_keys()
+    # One summary scan, then only the job that changed is read
+    assert jenkins.counts['root'] == 1
+    assert jenkins.counts['job'] == 1
+
+
+def test_no_events_yet_on_a_freshly_booted_host(app_module, jenkins, idle, monkeypatch):
+    # A host up for less than the reconcile window: its monotonic clock is still inside it
+    monkeypatch.setattr(app_module, 'DISCOVERY_RECONCILE_INTERVAL', time.monotonic() + 3600)
+    state = discovery_state()
+    discover(app_module, state)
+    start_build(idle[0])
+    jenkins.counts.clear()
+    assert discover(app_module, state) == running_keys()
+    assert jenkins.counts['root'] == 1
+
+
+def test_events_replace_the_summary_scan(app_module, jenkins, idle, running):
+    state = discovery_state()
+    discover(app_module, state)
+    state['last_event'] = time.monotonic()
+    jenkins.counts.clear()
+    unchanged = discover(app_module, state)
+    assert jenkins.counts['total'] == 0
+
+    start_build(idle[0])
+    assert discover(app_module, state) == unchanged
+    state['pending']['started'].add(idle[0])
+    job_name, build = next(iter(running.items()))
+    state['pending']['completed'].add((job_name, build['number']))
+    found = discover(app_module, state)
+    assert (idle[0], jenkins.topology[idle[0]]['builds'][0]['number']) in found
+    assert (job_name, build['number']) not in found
+    assert jenkins.counts['root'] == 0
+    assert jenkins.counts['job'] == 1
+
+
+@pytest.fixture
+def incremental(app_module, monkeypatch):
+    """Incremental discovery with run events enabled, starting from a first pass"""
+    monkeypatch.setattr(app_module, 'DISCOVERY_MODE', 'incremental')
+    monkeypatch.setattr(app_module, 'JENKINS_EVENTS_TOKEN', EVENTS_TOKEN)
+    state = app_module.jenkins_controllers[app_module.DEFAULT_CONTROLLER]['discovery']
+    state.update(discovery_state())
+    app_module.refresh_requested.set()
+    wait_until(lambda: state['job_summaries'])
+    refresh_snapshot()
+
+
+def post_events(client, events, token=EVENTS_TOKEN):
+    return client.post('/api/jenkins/events', json=events, headers={'X-Jenkins-Events-Token': token})
+
+
+def test_events_endpoint_is_off_without_a_token(client):
+    assert post_events(client, {'event': 'started', 'job': 'job1', 'number': 1}).status_code == 404
+
+
+@pytest.mark.usefixtures('jenkins', 'incremental')
+def test_events_endpoint_rejects_bad_requests(client):
+    assert post_events(client, {'event': 'started', 'job': 'job1', 'number': 1}, token='nope').status_code == 403
+    assert post_events(client, [{'event': 'bogus', 'job': 'job1', 'number': 1}, 'x']).status_code == 400
+    assert post_events(client, {'event': 'started', 'job': 'job1', 'number': 'one'}).status_code == 400
+    response = client.post('/api/jenkins/events?controller=nope', json={'event': 'started', 'job': 'job1', 'number': 1},
+                           headers={'X-Jenkins-Events-Token': EVENTS_TOKEN})
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures('incremental')
+def test_pushed_events_reach_the_snapshot(app_module, client, jenkins, idle, running):
+    job_name, build = next(iter(running.items()))
+    build['building'] = False
+    jenkins.topology[job_name]['color'] = 'blue'
+    start_build(idle[0])
+    number = jenkins.topology[idle[0]]['builds'][0]['number']
+    jenkins.counts.clear()
+
+    response = post_events(client, [{'event': 'completed', 'job': job_name, 'number': build['number']},
+                                    {'event': 'started', 'job': idle[0], 'number': number}])
+    assert response.status_code == 202
+    assert response.json['accepted'] == 2
+    wait_until(lambda: {(b['job_name'], b['build_number']) for b in app_module.builds_snapshot['builds']}
+               == running_keys())
+    assert len(app_module.builds_snapshot['builds']) == RUNNING_BUILDS
+    # The events said what changed, no summary scan was needed
+    assert jenkins.counts['root'] == 0
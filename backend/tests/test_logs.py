@@ -0,0 +1,73 @@
+"""Console log tail and follow-up reads, positioned by Jenkins' X-Text-Size"""
+
+import time
+
+import pytest
+
+import fake_jenkins
+
+
+def stripped_log(job_name, build, end):
+    """The first `end` bytes of a build's log as progressiveText sends it, console notes removed"""
+    return fake_jenkins.CONSOLE_NOTE_PATTERN.sub(b'', fake_jenkins.log_bytes(job_name, build, 0, end)).decode()
+
+
+@pytest.fixture
+def build_log(app_module, running):
+    """URL and fake build of the running build with the shortest log, with no cached tail"""
+    job_name, build = min(running.items(), key=lambda item: fake_jenkins.log_size(item[1]))
+    app_module.log_tails.clear()
+    return f"/api/builds/{job_name}/{build['number']}/log", job_name, build
+
+
+def test_first_view_is_the_end_of_the_log(client, build_log):
+    url, job_name, build = build_log
+    body = client.get(url).json
+    assert body['building'] is True
+    assert body['offset'] == body['size']
+    assert body['truncated'] is True
+    assert body['text']
+    assert stripped_log(job_name, build, body['offset']).endswith(body['text'])
+
+
+def test_following_the_log_does_not_drift(client, build_log):
+    url, job_name, build = build_log
+    body = client.get(url).json
+    shown, offset = body['text'], body['offset']
+    for _ in range(3):
+        time.sleep(0.2)
+        body = client.get(f'{url}?offset={offset}').json
+        assert body['truncated'] is False
+        assert body['offset'] >= offset
+        shown += body['text']
+        offset = body['offset']
+    # Offsets are positions in the stored log, which is longer than the text once notes are stripped
+    assert stripped_log(job_name, build, offset).endswith(shown)
+
+
+def test_another_worker_resumes_without_rereading_the_log(app_module, client, build_log, jenkins):
+    url, job_name, build = build_log
+    body = client.get(url).json
+    shown, offset = body['text'], body['offset']
+    # A worker that never served this build only has the size shared through SHARED_STATE_DIR
+    app_module.log_tails.clear()
+    time.sleep(0.2)
+    jenkins.counts.clear()
+    body = client.get(f'{url}?offset={offset}').json
+    assert body['truncated'] is False
+    shown += body['text']
+    assert stripped_log(job_name, build, body['offset']).endswith(shown)
+    assert jenkins.counts['log_rendered_bytes'] < fake_jenkins.log_size(build) // 10
+
+
+def test_finished_build(app_module, client, idle, jenkins):
+    job_name = idle[0]
+    build = jenkins.topology[job_name]['builds'][0]
+    app_module.log_tails.clear()
+    body = client.get(f"/api/builds/{job_name}/{build['number']}/log").json
+    assert body['building'] is False
+    assert body['size'] == body['offset'] == fake_jenkins.log_size(build)
+
+
+def test_unknown_build_is_404(client):
+    assert client.get('/api/builds/no-such-job/1/log').status_code == 404
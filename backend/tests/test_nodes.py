@@ -0,0 +1,17 @@
+"""Executor use per node and label"""
+
+from conftest import RUNNING_BUILDS
+
+
+def test_totals_count_every_running_build(client):
+    body = client.get('/api/nodes').json
+    assert body['totals']['busy'] == RUNNING_BUILDS
+    assert body['totals']['busy'] + body['totals']['idle'] == body['totals']['executors']
+
+
+def test_unchanged_nodes_revalidate_with_304(client):
+    etag = client.get('/api/nodes').headers['ETag']
+    assert client.get('/api/nodes', headers={'If-None-Match': etag}).status_code == 304
+    # As sent back by browsers behind nginx, which weakens the ETag of gzipped bodies
+    assert client.get('/api/nodes', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get('/api/nodes?label=pool0', headers={'If-None-Match': etag}).status_code == 200
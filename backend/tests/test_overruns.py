@@ -0,0 +1,100 @@
+"""Overrun policy: flagging builds past their limit, notifying and rate-limited aborts"""
+
+import time
+
+import pytest
+
+from conftest import backend
+
+# The policy under test; the poller's own calls are switched off while a test changes the policy
+enforce_overrun_policy = backend.enforce_overrun_policy
+HOUR_MS = 3600 * 1000
+
+
+@pytest.fixture
+def overrunning(app_module, running):
+    """Records of two running builds that started an hour ago with a one minute estimate"""
+    builds = []
+    for job_name, build in list(running.items())[:2]:
+        record = app_module.make_build_record(job_name, build)
+        builds.append({**record, 'controller': app_module.DEFAULT_CONTROLLER,
+                       'start_time': int(time.time() * 1000) - HOUR_MS, 'estimated_duration': 60 * 1000})
+    return builds
+
+
+@pytest.fixture
+def policy(app_module, monkeypatch):
+    """Set the overrun policy for one test"""
+    # A cancel wakes the poller, which must not apply the policy to the real snapshot meanwhile
+    monkeypatch.setattr(app_module, 'enforce_overrun_policy', lambda builds, previous: previous)
+
+    def set_policy(action, dry_run=True, max_aborts=10, limits=''):
+        monkeypatch.setattr(app_module, 'OVERRUN_ACTION', action)
+        monkeypatch.setattr(app_module, 'OVERRUN_DRY_RUN', dry_run)
+        monkeypatch.setattr(app_module, 'OVERRUN_MAX_ABORTS_PER_HOUR', max_aborts)
+        monkeypatch.setattr(app_module, 'overrun_limits', app_module.parse_overrun_limits(limits))
+    return set_policy
+
+
+def test_limit_is_a_multiple_of_the_estimate_with_a_floor(app_module):
+    build = {'job_name': 'folder0/job1', 'estimated_duration': 60 * 60 * 1000}
+    assert app_module.overrun_limit(build) == app_module.OVERRUN_FACTOR * 3600
+    assert app_module.overrun_limit({**build, 'estimated_duration': 1000}) == app_module.OVERRUN_MIN_MINUTES * 60
+    assert app_module.overrun_limit({**build, 'estimated_duration': -1}) is None
+
+
+def test_limits_by_pattern_take_precedence(app_module, policy):
+    policy('notify', limits='folder0/job1=0, folder0/*=30, bad')
+    assert app_module.overrun_limit({'job_name': 'folder0/job2', 'estimated_duration': -1}) == 30 * 60
+    assert app_module.overrun_limit({'job_name': 'folder0/job1', 'estimated_duration': 60 * 1000}) is None
+    assert len(app_module.overrun_limits) == 2
+
+
+def test_notify_flags_each_build_once(app_module, policy, overrunning, jenkins):
+    policy('notify')
+    state = enforce_overrun_policy(overrunning, {})
+    assert {o['action'] for o in state['builds'].values()} == {'notified'}
+    again = enforce_overrun_policy(overrunning, state)
+    assert again['builds'] == {key: {**o, 'running_seconds': again['builds'][key]['running_seconds']}
+                               for key, o in state['builds'].items()}
+    assert jenkins.counts['stop'] == 0
+
+
+def test_builds_back_within_their_limit_are_dropped(app_module, policy, overrunning):
+    policy('notify')
+    state = enforce_overrun_policy(overrunning, {})
+    recent = [{**overrunning[0], 'start_time': int(time.time() * 1000)}, overrunning[1]]
+    assert len(enforce_overrun_policy(recent, state)['builds']) == 1
+
+
+def test_dry_run_aborts_nothing(app_module, policy, overrunning, jenkins):
+    policy('abort', dry_run=True)
+    state = enforce_overrun_policy(overrunning, {})
+    assert {o['action'] for o in state['builds'].values()} == {'dry_run'}
+    assert jenkins.counts['stop'] == 0
+    assert state['aborts'] == []
+
+
+def test_aborts_are_rate_limited(app_module, policy, overrunning, jenkins):
+    policy('abort', dry_run=False, max_aborts=1)
+    state = enforce_overrun_policy(overrunning, {})
+    actions = sorted(o['action'] for o in state['builds'].values())
+    assert actions == ['aborted', 'rate_limited']
+    assert jenkins.counts['stop'] == 1
+    aborted = next(o for o in state['builds'].values() if o['action'] == 'aborted')
+    assert jenkins.topology[aborted['job_name']]['builds'][0]['building'] is False
+
+    # The rate-limited build is aborted once the hourly budget allows it
+    state['aborts'] = [time.time() - 3601]
+    remaining = [b for b in overrunning if b['job_name'] != aborted['job_name']]
+    later = enforce_overrun_policy(remaining, state)
+    assert [o['action'] for o in later['builds'].values()] == ['aborted']
+    assert jenkins.counts['stop'] == 2
+
+
+def test_overruns_endpoint_reports_the_policy(client, policy):
+    policy('notify', limits='folder0/*=30')
+    body = client.get('/api/overruns').json
+    assert body['policy']['action'] == 'notify'
+    assert body['policy']['limits'] == [{'pattern': 'folder0/*', 'minutes': 30.0}]
+    assert body['count'] == len(body['builds'])
@@ -0,0 +1,65 @@
+"""Build queue list, revalidation and cancels"""
+
+import pytest
+
+from conftest import QUEUED_ITEMS
+
+
+def test_lists_the_queue_oldest_first(client):
+    body = client.get('/api/queue').json
+    assert body['total'] == body['queue_length'] == QUEUED_ITEMS
+    since = [item['queued_since'] for item in body['items']]
+    assert since == sorted(since)
+
+
+def test_unchanged_queue_revalidates_with_304(client):
+    etag = client.get('/api/queue?limit=3').headers['ETag']
+    assert client.get('/api/queue?limit=3', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/queue?limit=4', headers={'If-None-Match': etag}).status_code == 200
+    # As sent back by browsers behind nginx, which weakens the ETag of gzipped bodies
+    assert client.get('/api/queue?limit=3', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', '51', 'abc'])
+def test_limit_out_of_range_is_rejected(client, limit):
+    response = client.get(f'/api/queue?limit={limit}')
+    assert response.status_code == 400
+    assert 'limit must be between' in response.json['error']
+
+
+@pytest.mark.parametrize('body, error', [
+    (['x'], 'must be a JSON object'),
+    ({'reason': 'tests', 'items': 5}, 'items must be a list'),
+    ({'reason': 'tests', 'filter': ['job']}, 'filter'),
+    ({'reason': 'tests', 'filter': {'job': 5}}, 'job'),
+    ({'items': [1]}, 'reason is required'),
+])
+def test_bulk_cancel_rejects_malformed_bodies(client, body, error):
+    response = client.post('/api/queue/cancel', json=body)
+    assert response.status_code == 400
+    assert error in response.json['error']
+
+
+def test_bulk_cancel_dry_run_by_filter(client, jenkins):
+    items = client.get('/api/queue').json['items']
+    cause = items[0]['cause']
+    response = client.post('/api/queue/cancel', json={'reason': 'tests', 'dry_run': True, 'filter': {'cause': cause}})
+    assert response.status_code == 200
+    assert {i['id'] for i in response.json['items']} == {i['id'] for i in items if cause in i['cause']}
+    assert len(jenkins.queue) == QUEUED_ITEMS
+
+
+def test_cancel_one_item(client, jenkins):
+    item_id = client.get('/api/queue?limit=1').json['items'][0]['id']
+    response = client.post(f'/api/queue/{item_id}/cancel', json={'reason': 'tests'})
+    assert response.status_code == 200
+    assert item_id not in jenkins.queue
+    assert client.post(f'/api/queue/{item_id}/cancel', json={}).status_code == 400
+
+
+@pytest.mark.parametrize('body', [['tests'], 'tests', 5])
+def test_cancel_one_item_rejects_bodies_that_are_not_objects(client, body):
+    item_id = client.get('/api/queue?limit=1').json['items'][0]['id']
+    response = client.post(f'/api/queue/{item_id}/cancel', json=body)
+    assert response.status_code == 400
+    assert 'must be a JSON object' in response.json['error']
@@ -0,0 +1,64 @@
+#!groovy
+
+import jenkins.model.*
+import hudson.model.*
+import hudson.model.listeners.RunListener
+import groovy.json.JsonOutput
+import java.util.concurrent.*
+
+// Push run started/completed events to the stop-job backend, so it only has to
+// re-read the jobs that actually changed instead of scanning Jenkins on every poll
+def eventsUrl = System.getenv('STOPJOB_EVENTS_URL') ?: 'http://web-backend:5000/api/jenkins/events'
+def eventsToken = System.getenv('JENKINS_EVENTS_TOKEN') ?: ''
+
+class StopJobEventsListener extends RunListener<Run> {
+    String url
+    String token
+    // One sender thread; when the backend is down the oldest events are dropped
+    ExecutorService sender = new ThreadPoolExecutor(1, 1, 0L, TimeUnit.MILLISECONDS,
+        new ArrayBlockingQueue<Runnable>(1000), new ThreadPoolExecutor.DiscardOldestPolicy())
+
+    void onStarted(Run run, TaskListener listener) {
+        send('started', run)
+    }
+
+    void onCompleted(Run run, TaskListener listener) {
+        send('completed', run)
+    }
+
+    void send(String event, Run run) {
+        def body = JsonOutput.toJson([event: event, job: run.getParent().getFullName(), number: run.getNumber()])
+        sender.submit({
+            try {
+                def connection = new URL(url).openConnection()
+                connection.setRequestMethod('POST')
+                connection.setConnectTimeout(2000)
+                connection.setReadTimeout(5000)
+                connection.setDoOutput(true)
+                connection.setRequestProperty('Content-Type', 'application/json')
+                connection.setRequestProperty('X-Jenkins-Events-Token', token)
+                connection.getOutputStream().withStream { it.write(body.getBytes('UTF-8')) }
+                connection.getResponseCode()
+                connection.disconnect()
+            } catch (Exception e) {
+                // The backend falls back to polling, a lost event only delays an update
+                println "Failed to send ${event} event for ${run}: ${e.message}"
+            }
+        } as Runnable)
+    }
+}
+
+if (!eventsToken) {
+    println "JENKINS_EVENTS_TOKEN not set, not pushing build events to the stop-job backend"
+    return
+}
+
+// Replace any listener registered by an earlier run of this script
+def listeners = ExtensionList.lookup(RunListener.class)
+listeners.findAll { it.getClass().getName() == 'StopJobEventsListener' }.each {
+    it.sender.shutdown()
+    listeners.remove(it)
+}
+listeners.add(new StopJobEventsListener(url: eventsUrl, token: eventsToken))
+
+println "Pushing build events to ${eventsUrl}"
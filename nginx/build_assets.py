@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Build the stop-job page for static serving.
+
+Minifies web/app.css and web/app.js, renames them after a hash of their content,
+points index.html at the new names and writes gzip (and, when the brotli module is
+installed, brotli) copies next to every file. nginx serves the result straight from
+disk with gzip_static; the .br copies are only used by the Flask fallback, since stock
+nginx has no brotli module. The hashed assets never change, so they are cached for good.
+
+    python nginx/build_assets.py                    # web/ -> web/dist/
+    python nginx/build_assets.py --src web --out /usr/share/nginx/stopjob
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = ('app.css', 'app.js')
+
+def minify_css(css):
+    """Drop comments and the whitespace CSS doesn't need"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip() + '\n'
+
+def minify_lines(text, comment=None):
+    """Strip indentation, blank lines and whole-line comments, keeping line breaks
+
+    Line breaks stay so automatic semicolon insertion keeps working; lines inside
+    JS template literals are only dedented, never dropped.
+    """
+    lines, in_template = [], False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not in_template and (not stripped or (comment and stripped.startswith(comment))):
+            continue
+        lines.append(stripped)
+        if comment:
+            in_template ^= len(re.findall(r'(?<!\\)`', stripped)) % 2 == 1
+    return '\n'.join(lines) + '\n'
+
+def write_compressed(path, data):
+    """Write data with .gz (and .br) copies for nginx gzip_static and the Flask fallback"""
+    with open(path, 'wb') as f:
+        f.write(data)
+    # mtime=0 keeps the output identical between builds of the same source
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+def build(src, out):
+    """Build src into out and return {source name: built name}"""
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    os.makedirs(os.path.join(out, 'assets'))
+
+    manifest = {}
+    minifiers = {'.css': minify_css, '.js': lambda js: minify_lines(js, '//')}
+    for name in ASSETS:
+        base, ext = os.path.splitext(name)
+        with open(os.path.join(src, name), encoding='utf-8') as f:
+            data = minifiers[ext](f.read()).encode()
+        built = f'assets/{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        write_compressed(os.path.join(out, built), data)
+        manifest[name] = built
+
+    with open(os.path.join(src, 'index.html'), encoding='utf-8') as f:
+        html = minify_lines(re.sub(r'<!--.*?-->', '', f.read(), flags=re.S))
+    for name, built in manifest.items():
+        html, count = re.subn(rf'(href|src)="{re.escape(name)}"', rf'\1="{built}"', html)
+        if not count:
+            raise SystemExit(f'index.html does not reference {name}')
+    write_compressed(os.path.join(out, 'index.html'), html.encode())
+
+    with open(os.path.join(out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--src', default=os.path.join(REPO_DIR, 'web'))
+    parser.add_argument('--out', default=os.path.join(REPO_DIR, 'web', 'dist'))
+    args = parser.parse_args()
+
+    manifest = build(args.src, args.out)
+    for name, built in [('index.html', 'index.html'), *manifest.items()]:
+        sizes = [os.path.getsize(os.path.join(args.src, name))]
+        sizes += [os.path.getsize(os.path.join(args.out, built + suffix)) for suffix in ('', '.gz', '.br')
+                  if os.path.exists(os.path.join(args.out, built + suffix))]
+        print(f"{built:<32} {' -> '.join(f'{s:,}' for s in sizes)} bytes")
+    if brotli is None:
+        print('brotli module not installed, skipped .br files', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,834 @@
+// Cognito Configuration
+const COGNITO_CONFIG = {
+    userPoolId: 'us-east-1_mHHkRBGwp',
+    clientId: '8suo93gn4lp3vm0dhv3prjtdn',
+    domain: 'jenkins-auth-62745.auth.us-east-1.amazoncognito.com',
+    redirectUri: window.location.origin + '/stopjob/',
+    responseType: 'code',
+    scope: 'openid email profile'
+};
+
+let accessToken = null;
+let userInfo = null;
+let userBuilds = [];
+// Build fields the list shows, the server leaves out the rest
+const BUILD_LIST_FIELDS = 'started_by,start_time,estimated_duration,node';
+let selectedBuilds = new Map();
+let buildsVersion = 0;
+let buildStream = null;
+let pendingBuildEvents = null;
+// How long to wait before reopening a stream the server turned away (it is at its limit)
+const STREAM_RETRY_MS = 30000;
+let streamRetryTimer = null;
+// Only builds on this node are listed, set by clicking a node
+let nodeFilter = null;
+let nodesTimer = null;
+let logStream = null;
+let logRetryTimer = null;
+// Characters kept in the log view, older output scrolls away
+const LOG_VIEW_MAX_CHARS = 200000;
+const NODES_REFRESH_INTERVAL = 30000;
+
+// DOM Elements
+const loading = document.getElementById('loading');
+const loginContainer = document.getElementById('loginContainer');
+const authenticatedContent = document.getElementById('authenticatedContent');
+const loginBtn = document.getElementById('loginBtn');
+const logoutBtn = document.getElementById('logoutBtn');
+const userEmail = document.getElementById('userEmail');
+const cancelForm = document.getElementById('cancelForm');
+const buildsList = document.getElementById('buildsList');
+const buildsLoading = document.getElementById('buildsLoading');
+const noBuilds = document.getElementById('noBuilds');
+const selectedBuildField = document.getElementById('selectedBuild');
+const clearSelectionBtn = document.getElementById('clearSelection');
+const refreshBuildsBtn = document.getElementById('refreshBuilds');
+const selectAllBuildsBtn = document.getElementById('selectAllBuilds');
+const clearNodeFilterBtn = document.getElementById('clearNodeFilter');
+const nodesList = document.getElementById('nodesList');
+const poolsList = document.getElementById('poolsList');
+const nodesLoading = document.getElementById('nodesLoading');
+const nodesSummary = document.getElementById('nodesSummary');
+const refreshNodesBtn = document.getElementById('refreshNodes');
+const cancelSubmitBtn = cancelForm.querySelector('button[type="submit"]');
+const logPanel = document.getElementById('logPanel');
+const logTitle = document.getElementById('logTitle');
+const logOutput = document.getElementById('logOutput');
+const closeLogBtn = document.getElementById('closeLog');
+
+// Utility Functions
+function showLoading() {
+    loading.classList.remove('hidden');
+    loginContainer.classList.add('hidden');
+    authenticatedContent.classList.add('hidden');
+}
+
+function showLogin() {
+    loading.classList.add('hidden');
+    loginContainer.classList.remove('hidden');
+    authenticatedContent.classList.add('hidden');
+}
+
+function showAuthenticated() {
+    loading.classList.add('hidden');
+    loginContainer.classList.add('hidden');
+    authenticatedContent.classList.remove('hidden');
+}
+
+// Authentication Functions
+function generateCodeVerifier() {
+    const array = new Uint32Array(56/2);
+    crypto.getRandomValues(array);
+    return Array.from(array, dec => ('0' + dec.toString(16)).substr(-2)).join('');
+}
+
+function generateCodeChallenge(verifier) {
+    const encoder = new TextEncoder();
+    const data = encoder.encode(verifier);
+    return crypto.subtle.digest('SHA-256', data).then(buffer => {
+        return btoa(String.fromCharCode(...new Uint8Array(buffer)))
+            .replace(/\+/g, '-')
+            .replace(/\//g, '_')
+            .replace(/=/g, '');
+    });
+}
+
+function initiateLogin() {
+    const codeVerifier = generateCodeVerifier();
+    sessionStorage.setItem('codeVerifier', codeVerifier);
+    
+    generateCodeChallenge(codeVerifier).then(codeChallenge => {
+        const state = Math.random().toString(36).substring(2, 15);
+        sessionStorage.setItem('state', state);
+        
+        const authUrl = `https://${COGNITO_CONFIG.domain}/oauth2/authorize?` +
+            `response_type=${COGNITO_CONFIG.responseType}&` +
+            `client_id=${COGNITO_CONFIG.clientId}&` +
+            `redirect_uri=${encodeURIComponent(COGNITO_CONFIG.redirectUri)}&` +
+            `scope=${encodeURIComponent(COGNITO_CONFIG.scope)}&` +
+            `state=${state}&` +
+            `code_challenge=${codeChallenge}&` +
+            `code_challenge_method=S256`;
+        
+        window.location.href = authUrl;
+    });
+}
+
+async function exchangeCodeForTokens(code, codeVerifier) {
+    const tokenUrl = `https://${COGNITO_CONFIG.domain}/oauth2/token`;
+    
+    const response = await fetch(tokenUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        },
+        body: new URLSearchParams({
+            grant_type: 'authorization_code',
+            client_id: COGNITO_CONFIG.clientId,
+            code: code,
+            redirect_uri: COGNITO_CONFIG.redirectUri,
+            code_verifier: codeVerifier
+        })
+    });
+
+    if (!response.ok) {
+        throw new Error('Token exchange failed');
+    }
+
+    return response.json();
+}
+
+async function getUserInfo(accessToken) {
+    const userInfoUrl = `https://${COGNITO_CONFIG.domain}/oauth2/userInfo`;
+    
+    const response = await fetch(userInfoUrl, {
+        headers: {
+            'Authorization': `Bearer ${accessToken}`
+        }
+    });
+
+    if (!response.ok) {
+        throw new Error('Failed to get user info');
+    }
+
+    return response.json();
+}
+
+function logout() {
+    if (buildStream) {
+        buildStream.close();
+    }
+    clearTimeout(streamRetryTimer);
+    clearInterval(nodesTimer);
+    closeBuildLog();
+    sessionStorage.clear();
+    localStorage.clear();
+    accessToken = null;
+    userInfo = null;
+    
+    const logoutUrl = `https://${COGNITO_CONFIG.domain}/logout?` +
+        `client_id=${COGNITO_CONFIG.clientId}&` +
+        `logout_uri=${encodeURIComponent(COGNITO_CONFIG.redirectUri)}`;
+    
+    window.location.href = logoutUrl;
+}
+
+// Initialize App
+async function init() {
+    showLoading();
+    
+    // Check for authorization code in URL
+    const urlParams = new URLSearchParams(window.location.search);
+    const code = urlParams.get('code');
+    const state = urlParams.get('state');
+    
+    if (code && state) {
+        const storedState = sessionStorage.getItem('state');
+        const codeVerifier = sessionStorage.getItem('codeVerifier');
+        
+        if (state === storedState && codeVerifier) {
+            try {
+                const tokens = await exchangeCodeForTokens(code, codeVerifier);
+                
+                // Use ID token for authentication with backend (contains user info)
+                // and access token for Cognito userInfo endpoint
+                accessToken = tokens.id_token || tokens.access_token;
+                userInfo = await getUserInfo(tokens.access_token);
+                
+                // Store tokens
+                sessionStorage.setItem('accessToken', accessToken);
+                sessionStorage.setItem('userInfo', JSON.stringify(userInfo));
+                
+                console.log('Tokens received:', {
+                    access_token: tokens.access_token ? 'present' : 'missing',
+                    id_token: tokens.id_token ? 'present' : 'missing',
+                    token_type: tokens.token_type
+                });
+                
+                // Clear URL parameters
+                window.history.replaceState({}, document.title, window.location.pathname);
+                
+                showAuthenticated();
+                updateUserInterface();
+            } catch (error) {
+                console.error('Authentication failed:', error);
+                showLogin();
+            }
+        } else {
+            showLogin();
+        }
+    } else {
+        // Check for existing session
+        accessToken = sessionStorage.getItem('accessToken');
+        const storedUserInfo = sessionStorage.getItem('userInfo');
+        
+        if (accessToken && storedUserInfo) {
+            userInfo = JSON.parse(storedUserInfo);
+            showAuthenticated();
+            updateUserInterface();
+        } else {
+            showLogin();
+        }
+    }
+}
+
+async function updateUserInterface() {
+    if (userInfo) {
+        const email = userInfo.email || userInfo.username;
+        userEmail.textContent = email;
+        
+        // Set user avatar initial
+        const userAvatar = document.getElementById('userAvatar');
+        if (userAvatar && email) {
+            userAvatar.textContent = email.charAt(0).toUpperCase();
+        }
+        
+        // Debug: Check what token we have
+        try {
+            const debugResponse = await fetch('/stopjob/api/debug/token', {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${accessToken}`
+                }
+            });
+            
+            if (debugResponse.ok) {
+                const debugData = await debugResponse.json();
+                console.log('Token debug info:', debugData);
+            } else {
+                console.error('Token debug failed with status:', debugResponse.status);
+                const errorText = await debugResponse.text();
+                console.error('Debug error:', errorText);
+            }
+        } catch (error) {
+            console.error('Token debug request failed:', error);
+        }
+        
+        // Also test user info endpoint
+        try {
+            const userInfoResponse = await apiCall('/user/info');
+            console.log('User info from backend:', userInfoResponse);
+        } catch (error) {
+            console.error('User info request failed:', error);
+        }
+        
+        connectBuildStream();
+        loadNodes();
+        clearInterval(nodesTimer);
+        nodesTimer = setInterval(loadNodes, NODES_REFRESH_INTERVAL);
+    }
+}
+
+// API Functions
+async function apiCall(endpoint, options = {}) {
+    const defaultOptions = {
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${accessToken}`
+        }
+    };
+
+    try {
+        const response = await fetch(`/stopjob/api${endpoint}`, {
+            ...defaultOptions,
+            ...options,
+            headers: { ...defaultOptions.headers, ...options.headers }
+        });
+
+        if (!response.ok) {
+            let errorMessage = 'API request failed';
+            try {
+                const error = await response.json();
+                errorMessage = error.error || errorMessage;
+            } catch (e) {
+                errorMessage = `HTTP ${response.status}: ${response.statusText}`;
+            }
+            throw new Error(errorMessage);
+        }
+
+        return response.json();
+    } catch (error) {
+        if (error.name === 'TypeError' && error.message.includes('fetch')) {
+            throw new Error('Unable to connect to server. Please check if the backend is running.');
+        }
+        throw error;
+    }
+}
+
+async function loadUserBuilds() {
+    // Hold stream events until the full list is in, then replay the newer ones
+    pendingBuildEvents = pendingBuildEvents || [];
+    try {
+        buildsLoading.classList.remove('hidden');
+        noBuilds.classList.add('hidden');
+
+        const data = await apiCall(`/user/builds?fields=${BUILD_LIST_FIELDS}`);
+        userBuilds = data.builds || [];
+        buildsVersion = data.version || 0;
+        
+        const behind = Object.entries(data.controllers || {})
+            .filter(([, controller]) => !controller.connected || controller.stale)
+            .map(([name, controller]) => {
+                const since = controller.updated_at ? ` since ${new Date(controller.updated_at + 'Z').toLocaleTimeString()}` : '';
+                return `${name} (${controller.connected ? 'slow' : 'unreachable'}, not updated${since})`;
+            });
+        if (behind.length) {
+            showMessage(`Some running builds may be missing or out of date: ${behind.join(', ')}`, 'error');
+        } else if (data.complete === false) {
+            showMessage('Jenkins is responding slowly; some running builds may be missing from this list', 'error');
+        }
+
+        buildsLoading.classList.add('hidden');
+        renderBuilds();
+    } catch (error) {
+        console.error('Failed to load builds:', error);
+        buildsLoading.classList.add('hidden');
+        showMessage(`Failed to load builds: ${error.message}`, 'error');
+    } finally {
+        const queuedEvents = pendingBuildEvents;
+        pendingBuildEvents = null;
+        queuedEvents.forEach(([type, event]) => applyBuildEvent(type, event));
+    }
+}
+
+function buildKey(build) {
+    return `${build.controller || ''}/${build.job_name}#${build.build_number}`;
+}
+
+function connectBuildStream() {
+    if (!window.EventSource) {
+        loadUserBuilds();
+        return;
+    }
+    if (buildStream) {
+        buildStream.close();
+    }
+    clearTimeout(streamRetryTimer);
+
+    // EventSource cannot send an Authorization header, so the token goes in the query string
+    const stream = new EventSource(`/stopjob/api/builds/stream?access_token=${encodeURIComponent(accessToken)}`);
+    buildStream = stream;
+    // Sent on first connect and whenever events were missed
+    stream.addEventListener('resync', () => loadUserBuilds());
+    ['build_added', 'build_finished', 'build_cancelled'].forEach(type => {
+        stream.addEventListener(type, e => applyBuildEvent(type, JSON.parse(e.data)));
+    });
+    stream.onerror = () => {
+        if (stream.readyState !== EventSource.CLOSED) {
+            console.warn('Build stream interrupted, reconnecting...');
+            return;
+        }
+        // Refused outright: show the current list and ask again later
+        console.warn(`Build stream refused, retrying in ${STREAM_RETRY_MS / 1000}s`);
+        if (buildStream === stream) {
+            buildStream = null;
+        }
+        loadUserBuilds();
+        streamRetryTimer = setTimeout(connectBuildStream, STREAM_RETRY_MS);
+    };
+}
+
+function applyBuildEvent(type, event) {
+    if (pendingBuildEvents) {
+        pendingBuildEvents.push([type, event]);
+        return;
+    }
+    // Already reflected in the list we loaded
+    if (event.version <= buildsVersion) {
+        return;
+    }
+
+    const key = buildKey(event);
+    if (type === 'build_added') {
+        if (!userBuilds.some(build => buildKey(build) === key)) {
+            userBuilds.push(event);
+        }
+    } else {
+        userBuilds = userBuilds.filter(build => buildKey(build) !== key);
+        if (selectedBuilds.delete(key)) {
+            updateSelection();
+            if (type === 'build_cancelled') {
+                showMessage(`Build ${key} was cancelled by ${event.cancelled_by}`, 'success');
+            } else {
+                showMessage(`Build ${key} has finished`, 'success');
+            }
+        }
+    }
+    renderBuilds();
+}
+
+function visibleBuilds() {
+    return nodeFilter ? userBuilds.filter(build => (build.node || 'built-in') === nodeFilter) : userBuilds;
+}
+
+function renderBuilds() {
+    // Clear existing builds
+    const existingBuilds = buildsList.querySelectorAll('.build-item');
+    existingBuilds.forEach(item => item.remove());
+    clearNodeFilterBtn.classList.toggle('hidden', !nodeFilter);
+    clearNodeFilterBtn.textContent = nodeFilter ? `${nodeFilter} ✕` : 'All Nodes';
+
+    const builds = visibleBuilds();
+    if (builds.length === 0) {
+        noBuilds.classList.remove('hidden');
+        return;
+    }
+    noBuilds.classList.add('hidden');
+    const showControllers = new Set(userBuilds.map(build => build.controller)).size > 1;
+
+    // Build the list off-document and attach it in one go
+    const fragment = document.createDocumentFragment();
+    builds.forEach(build => {
+        const buildItem = document.createElement('div');
+        buildItem.className = 'build-item';
+        buildItem.dataset.jobName = build.job_name;
+        buildItem.dataset.buildNumber = build.build_number;
+
+        // Handle timestamp conversion
+        let startTimeStr = 'Unknown';
+        if (build.start_time && build.start_time > 0) {
+            const startTime = new Date(build.start_time);
+            startTimeStr = startTime.toLocaleString();
+        }
+
+        // Handle duration
+        const duration = build.estimated_duration && build.estimated_duration > 0 
+            ? Math.round(build.estimated_duration / 60000) 
+            : 'Unknown';
+
+        // Show who started the build
+        const startedBy = build.started_by || 'Unknown';
+
+        const selected = selectedBuilds.has(buildKey(build));
+
+        buildItem.innerHTML = `
+            <div class="build-header">
+                <div class="build-title">
+                    <input type="checkbox" class="build-select" ${selected ? 'checked' : ''}>
+                    ${build.job_name} #${build.build_number}
+                </div>
+                <button type="button" class="btn btn-secondary log-button">Log</button>
+                <span class="build-status">RUNNING</span>
+            </div>
+            <div class="build-details">
+                <div class="build-detail-item">
+                    <strong>Started by:</strong> ${startedBy}
+                </div>
+                <div class="build-detail-item">
+                    <strong>Started:</strong> ${startTimeStr}
+                </div>
+                <div class="build-detail-item">
+                    <strong>Est. Duration:</strong> ${duration} min
+                </div>
+                <div class="build-detail-item">
+                    <strong>Node:</strong> ${build.node || 'built-in'}
+                </div>
+                ${showControllers ? `<div class="build-detail-item">
+                    <strong>Controller:</strong> ${build.controller}
+                </div>` : ''}
+            </div>
+        `;
+
+        if (selected) {
+            buildItem.classList.add('selected');
+        }
+
+        buildItem.addEventListener('click', () => toggleBuild(build, buildItem));
+        buildItem.querySelector('.log-button').addEventListener('click', e => {
+            e.stopPropagation();
+            openBuildLog(build);
+        });
+        fragment.appendChild(buildItem);
+    });
+    buildsList.appendChild(fragment);
+}
+
+function toggleBuild(build, element) {
+    const key = buildKey(build);
+    if (selectedBuilds.has(key)) {
+        selectedBuilds.delete(key);
+    } else {
+        selectedBuilds.set(key, build);
+    }
+    element.classList.toggle('selected', selectedBuilds.has(key));
+    element.querySelector('.build-select').checked = selectedBuilds.has(key);
+    updateSelection();
+}
+
+function selectAllBuilds() {
+    // Toggle: select everything listed, or clear when everything is already selected
+    const builds = visibleBuilds();
+    if (builds.length > 0 && builds.every(build => selectedBuilds.has(buildKey(build)))) {
+        clearSelection();
+        return;
+    }
+    builds.forEach(build => selectedBuilds.set(buildKey(build), build));
+    renderBuilds();
+    updateSelection();
+}
+
+function updateSelection() {
+    cancelSubmitBtn.textContent = selectedBuilds.size > 1 ? `Cancel ${selectedBuilds.size} Builds` : 'Cancel Build';
+    if (selectedBuilds.size === 0) {
+        selectedBuildField.value = '';
+        cancelForm.classList.add('hidden');
+        return;
+    }
+
+    const builds = Array.from(selectedBuilds.values());
+    selectedBuildField.value = builds.length === 1
+        ? `${builds[0].job_name} #${builds[0].build_number}`
+        : `${builds.length} builds selected`;
+    
+    // Show cancel form
+    cancelForm.classList.remove('hidden');
+}
+
+function clearSelection() {
+    selectedBuilds.clear();
+    buildsList.querySelectorAll('.build-item.selected').forEach(item => {
+        item.classList.remove('selected');
+        item.querySelector('.build-select').checked = false;
+    });
+    updateSelection();
+    
+    // Clear reason field
+    document.getElementById('reason').value = '';
+}
+
+async function cancelSelectedBuilds(reason) {
+    const builds = Array.from(selectedBuilds.values());
+    if (builds.length === 0) {
+        throw new Error('No build selected');
+    }
+
+    if (builds.length === 1) {
+        const build = builds[0];
+        const response = await apiCall(`/builds/${buildPath(build)}/cancel`, {
+            method: 'POST',
+            body: JSON.stringify({ reason, controller: build.controller })
+        });
+        return { requested: 1, cancelled: 1, failed: 0, results: [response] };
+    }
+
+    return apiCall('/builds/cancel', {
+        method: 'POST',
+        body: JSON.stringify({
+            reason,
+            builds: builds.map(build => ({
+                job_name: build.job_name,
+                build_number: build.build_number,
+                controller: build.controller
+            }))
+        })
+    });
+}
+
+async function loadNodes() {
+    try {
+        const data = await apiCall('/nodes');
+        nodesLoading.classList.add('hidden');
+        renderNodes(data);
+    } catch (error) {
+        console.error('Failed to load nodes:', error);
+        nodesLoading.textContent = `Failed to load nodes: ${error.message}`;
+    }
+}
+
+function usageBar(busy, executors) {
+    const percent = executors > 0 ? Math.round(100 * busy / executors) : 0;
+    return `<div class="usage-bar"><div class="usage-fill" style="width: ${percent}%"></div></div>`;
+}
+
+function renderNodes(data) {
+    const totals = data.totals;
+    nodesSummary.textContent = `— ${totals.busy} of ${totals.executors} executors busy, ${totals.queued} queued`;
+
+    // Label pools, saturated ones first
+    poolsList.innerHTML = '';
+    const pools = document.createDocumentFragment();
+    data.labels.forEach(pool => {
+        const poolItem = document.createElement('div');
+        poolItem.className = `node-item${pool.saturated ? ' saturated' : ''}`;
+        poolItem.innerHTML = `
+            <div class="build-header">
+                <div class="build-title">${pool.label}</div>
+                ${pool.saturated ? '<span class="build-status" style="background: #fee2e2; color: #991b1b;">Saturated</span>' : ''}
+            </div>
+            ${usageBar(pool.busy, pool.executors)}
+            <div class="build-details">
+                <div class="build-detail-item"><strong>Busy:</strong> ${pool.busy} / ${pool.executors}</div>
+                <div class="build-detail-item"><strong>Queued:</strong> ${pool.queued}</div>
+                <div class="build-detail-item"><strong>Nodes:</strong> ${pool.nodes}${pool.offline_nodes ? ` (${pool.offline_nodes} offline)` : ''}</div>
+            </div>
+        `;
+        pools.appendChild(poolItem);
+    });
+    poolsList.appendChild(pools);
+
+    // Busiest nodes first; clicking one lists only its builds
+    nodesList.innerHTML = '';
+    const nodes = document.createDocumentFragment();
+    data.nodes
+        .slice()
+        .sort((a, b) => a.idle - b.idle || b.busy - a.busy || a.name.localeCompare(b.name))
+        .forEach(node => {
+            const longest = node.longest_build;
+            const runningMinutes = longest && longest.start_time > 0
+                ? Math.round((Date.now() - longest.start_time) / 60000)
+                : null;
+            const nodeItem = document.createElement('div');
+            nodeItem.className = `node-item${node.idle === 0 && !node.offline && node.executors > 0 ? ' saturated' : ''}`;
+            nodeItem.innerHTML = `
+                <div class="build-header">
+                    <div class="build-title">${node.name}</div>
+                    <span style="color: #64748b; font-size: 13px;">${node.offline ? 'OFFLINE' : `${node.busy} / ${node.executors} busy`}</span>
+                </div>
+                ${usageBar(node.busy, node.executors)}
+                <div class="build-details">
+                    <div class="build-detail-item"><strong>Labels:</strong> ${node.labels.join(', ') || 'none'}</div>
+                    <div class="build-detail-item"><strong>Longest:</strong> ${longest
+                        ? `${longest.job_name} #${longest.build_number}${runningMinutes !== null ? ` (${runningMinutes} min)` : ''}`
+                        : 'idle'}</div>
+                </div>
+            `;
+            nodeItem.addEventListener('click', () => filterBuildsByNode(node.name));
+            nodes.appendChild(nodeItem);
+        });
+    nodesList.appendChild(nodes);
+}
+
+function filterBuildsByNode(name) {
+    nodeFilter = name;
+    renderBuilds();
+    buildsList.scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+function buildPath(build) {
+    return `${build.job_name.split('/').map(encodeURIComponent).join('/')}/${build.build_number}`;
+}
+
+async function openBuildLog(build) {
+    closeBuildLog();
+    logTitle.textContent = `${build.job_name} #${build.build_number}`;
+    logOutput.textContent = '';
+    logPanel.classList.remove('hidden');
+    logPanel.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+
+    if (!window.EventSource) {
+        try {
+            appendLog(await apiCall(`/builds/${buildPath(build)}/log?controller=${encodeURIComponent(build.controller)}`));
+        } catch (error) {
+            appendLog({ text: `Failed to load log: ${error.message}` });
+        }
+        return;
+    }
+    connectLogStream(build);
+}
+
+function connectLogStream(build, offset) {
+    // Only new output is sent; a reconnect resumes from the last offset received
+    const resume = offset !== undefined ? `&offset=${offset}` : '';
+    const stream = new EventSource(`/stopjob/api/builds/${buildPath(build)}/log/stream?access_token=${encodeURIComponent(accessToken)}&controller=${encodeURIComponent(build.controller)}${resume}`);
+    logStream = stream;
+    stream.addEventListener('log', e => {
+        const chunk = JSON.parse(e.data);
+        offset = chunk.offset;
+        appendLog(chunk);
+    });
+    stream.addEventListener('end', () => {
+        appendLog({ text: '\n[build finished]\n' });
+        stream.close();
+    });
+    stream.addEventListener('log_error', e => {
+        appendLog({ text: JSON.parse(e.data).error });
+        stream.close();
+    });
+    stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED && logStream === stream) {
+            appendLog({ text: `\n[log stream unavailable, retrying in ${STREAM_RETRY_MS / 1000}s]\n` });
+            logRetryTimer = setTimeout(() => connectLogStream(build, offset), STREAM_RETRY_MS);
+        }
+    };
+}
+
+function appendLog(chunk) {
+    // Keep following the output unless the user scrolled up to read
+    const following = logOutput.scrollTop + logOutput.clientHeight >= logOutput.scrollHeight - 20;
+    let text = logOutput.textContent + (chunk.truncated ? '[...]\n' : '') + chunk.text;
+    if (text.length > LOG_VIEW_MAX_CHARS) {
+        text = text.slice(text.indexOf('\n', text.length - LOG_VIEW_MAX_CHARS) + 1);
+    }
+    logOutput.textContent = text;
+    if (following) {
+        logOutput.scrollTop = logOutput.scrollHeight;
+    }
+}
+
+function closeBuildLog() {
+    clearTimeout(logRetryTimer);
+    if (logStream) {
+        logStream.close();
+        logStream = null;
+    }
+    logPanel.classList.add('hidden');
+}
+
+function showMessage(message, type = 'info') {
+    // Remove existing messages
+    const existingMessages = document.querySelectorAll('.error-message, .success-message');
+    existingMessages.forEach(msg => msg.remove());
+
+    const messageDiv = document.createElement('div');
+    messageDiv.className = type === 'error' ? 'error-message' : 'success-message';
+    messageDiv.textContent = message;
+
+    // Insert before the builds list
+    const buildsContainer = document.querySelector('.form-group');
+    buildsContainer.parentNode.insertBefore(messageDiv, buildsContainer);
+
+    // Auto-hide after 5 seconds
+    setTimeout(() => {
+        if (messageDiv.parentNode) {
+            messageDiv.remove();
+        }
+    }, 5000);
+}
+
+// Event Listeners
+loginBtn.addEventListener('click', initiateLogin);
+logoutBtn.addEventListener('click', logout);
+clearSelectionBtn.addEventListener('click', clearSelection);
+refreshBuildsBtn.addEventListener('click', loadUserBuilds);
+selectAllBuildsBtn.addEventListener('click', selectAllBuilds);
+refreshNodesBtn.addEventListener('click', loadNodes);
+closeLogBtn.addEventListener('click', closeBuildLog);
+clearNodeFilterBtn.addEventListener('click', () => {
+    nodeFilter = null;
+    renderBuilds();
+});
+
+// Handle form submission with event delegation since the form structure changed
+document.addEventListener('submit', async function(e) {
+    if (e.target.id === 'cancelForm') {
+        e.preventDefault();
+        
+        const formData = new FormData(e.target);
+        const reason = formData.get('reason').trim();
+        
+        if (!reason) {
+            showMessage('Please provide a reason for cancellation', 'error');
+            return;
+        }
+
+        if (selectedBuilds.size === 0) {
+            showMessage('Please select a build to cancel', 'error');
+            return;
+        }
+        
+        // Show confirmation
+        const selectedNames = Array.from(selectedBuilds.keys());
+        const confirmMsg = selectedNames.length === 1
+            ? `Are you sure you want to cancel build "${selectedNames[0]}"?\n\nReason: ${reason}`
+            : `Are you sure you want to cancel ${selectedNames.length} builds?\n\n${selectedNames.slice(0, 10).join('\n')}` +
+              `${selectedNames.length > 10 ? '\n...' : ''}\n\nReason: ${reason}`;
+        
+        if (confirm(confirmMsg)) {
+            try {
+                // Disable submit button
+                cancelSubmitBtn.disabled = true;
+                cancelSubmitBtn.textContent = 'Cancelling...';
+                
+                const response = await cancelSelectedBuilds(reason);
+                
+                if (response.failed === 0) {
+                    showMessage(response.requested === 1
+                        ? `Build ${selectedNames[0]} has been successfully cancelled`
+                        : `${response.cancelled} builds have been successfully cancelled`, 'success');
+                } else {
+                    const failures = response.results
+                        .filter(result => result.status !== 'cancelled')
+                        .map(result => `${result.job_name} #${result.build_number} (${result.error})`);
+                    showMessage(`Cancelled ${response.cancelled} of ${response.requested} builds. Failed: ${failures.join(', ')}`, 'error');
+                }
+                
+                // The build stream removes the builds once Jenkins reports them stopped
+                clearSelection();
+                if (!buildStream) {
+                    setTimeout(() => loadUserBuilds(), 2000); // Reload after 2 seconds
+                }
+                
+            } catch (error) {
+                console.error('Cancellation failed:', error);
+                showMessage(`Failed to cancel build: ${error.message}`, 'error');
+            } finally {
+                // Re-enable submit button
+                cancelSubmitBtn.disabled = false;
+                updateSelection();
+            }
+        }
+    }
+});
+
+// Initialize the application
+init();